@@ -24,11 +24,21 @@ Usage example:
 """
 
 import argparse
+import concurrent.futures
 import csv
+import dataclasses
 import datetime
+import functools
+import google.protobuf.message as message
 import google.protobuf.text_format as text_format
 import hashlib
+import json
+import mmap
+import operator
 import os
+import re
+import stat
+import threading
 import metadata_file_pb2
 import sbom_data
 import sbom_writers
@@ -38,9 +48,30 @@ import sbom_writers
 PKG_SOURCE = 'SOURCE'
 PKG_UPSTREAM = 'UPSTREAM'
 PKG_PREBUILT = 'PREBUILT'
+PKG_PLATFORM = 'PLATFORM'
+
+# Installed files larger than this are memory-mapped when calculating checksums, smaller ones are read in
+# chunks into a read buffer reused by each thread
+CHECKSUM_MMAP_THRESHOLD = 8 << 20
+CHECKSUM_CHUNK_SIZE = 1 << 20
+# Files are hashed in batches by worker processes, each overlapping reads of a batch with threads
+CHECKSUM_BATCH_SIZE = 128
+CHECKSUM_THREADS_PER_PROCESS = 4
+# Checksums of build outputs from the last run, stored in the product out directory
+CHECKSUM_CACHE_FILE = '.sbom-sha1-cache.json'
+# Parsed METADATA files in binary wire format, stored in the product out directory
+METADATA_CACHE_DIR = '.sbom-metadata-cache'
 
 # Security tag
 NVD_CPE23 = 'NVD-CPE2.3:'
+# Security tags are matched case-insensitively against these prefixes
+NVD_CPE23_CPE23_PREFIX = (NVD_CPE23 + 'cpe:2.3:').lower()
+NVD_CPE23_CPE22_PREFIX = (NVD_CPE23 + 'cpe:/').lower()
+
+# SPDXID encoding
+SPDXID_SEPARATOR_TRANSLATION = str.maketrans('_@/', '---')
+# \w matches the same characters as str.isalnum() once '_' has been translated
+SPDXID_UNSUPPORTED_CHAR_PATTERN = re.compile(r'[^\w.-]')
 
 # Report
 ISSUE_NO_METADATA = 'No metadata generated in Make for installed files:'
@@ -50,7 +81,7 @@ ISSUE_UNKNOWN_SECURITY_TAG_TYPE = 'Unknown security tag type:'
 ISSUE_INSTALLED_FILE_NOT_EXIST = 'Non-exist installed files:'
 INFO_METADATA_FOUND_FOR_PACKAGE = 'METADATA file found for packages:'
 
-SOONG_PREBUILT_MODULE_TYPES = [
+SOONG_PREBUILT_MODULE_TYPES = frozenset([
   'android_app_import',
   'android_library_import',
   'cc_prebuilt_binary',
@@ -80,7 +111,7 @@ SOONG_PREBUILT_MODULE_TYPES = [
   'rust_prebuilt_library',
   'rust_prebuilt_rlib',
   'vndk_prebuilt_shared',
-]
+])
 
 
 def get_args():
@@ -93,6 +124,8 @@ def get_args():
   parser.add_argument('--json', action='store_true', default=False, help='Generated SBOM file in SPDX JSON format')
   parser.add_argument('--unbundled_apk', action='store_true', default=False, help='Generate SBOM for unbundled APKs')
   parser.add_argument('--unbundled_apex', action='store_true', default=False, help='Generate SBOM for unbundled APEXs')
+  parser.add_argument('--product_out_dir', help='The product out directory to keep caches between runs in. '
+                                                'No cache is used if not set.')
 
   return parser.parse_args()
 
@@ -103,17 +136,11 @@ def log(*info):
       print(i)
 
 
+@functools.lru_cache(maxsize=None)
 def encode_for_spdxid(s):
   """Simple encode for string values used in SPDXID which uses the charset of A-Za-Z0-9.-"""
-  result = ''
-  for c in s:
-    if c.isalnum() or c in '.-':
-      result += c
-    elif c in '_@/':
-      result += '-'
-    else:
-      result += '0x' + c.encode('utf-8').hex()
-
+  result = s.translate(SPDXID_SEPARATOR_TRANSLATION)
+  result = SPDXID_UNSUPPORTED_CHAR_PATTERN.sub(lambda m: '0x' + m.group().encode('utf-8').hex(), result)
   return result.lstrip('-')
 
 
@@ -125,40 +152,157 @@ def new_file_id(file_path):
   return f'SPDXRef-{encode_for_spdxid(file_path)}'
 
 
-def checksum(file_path):
+checksum_buffers = threading.local()
+
+
+def get_checksum_buffer():
+  """Return the read buffer of the current thread and a memoryview of it, for calculating checksums.
+
+  The buffer is allocated once per thread, and the threads of checksum_executor live as long as their
+  process, so it is reused for every file hashed in the process.
+  """
+  if not hasattr(checksum_buffers, 'buffer'):
+    checksum_buffers.buffer = bytearray(CHECKSUM_CHUNK_SIZE)
+    checksum_buffers.view = memoryview(checksum_buffers.buffer)
+  return checksum_buffers.buffer, checksum_buffers.view
+
+
+def checksum(file_path, file_stat):
+  """Return the checksum of a file, whose os.lstat() result is file_stat."""
   h = hashlib.sha1()
-  if os.path.islink(file_path):
+  if stat.S_ISLNK(file_stat.st_mode):
     h.update(os.readlink(file_path).encode('utf-8'))
   else:
     with open(file_path, 'rb') as f:
-      h.update(f.read())
+      if file_stat.st_size > CHECKSUM_MMAP_THRESHOLD:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+          h.update(mm)
+      else:
+        buffer, view = get_checksum_buffer()
+        while n := f.readinto(buffer):
+          h.update(view if n == CHECKSUM_CHUNK_SIZE else view[:n])
   return f'SHA1: {h.hexdigest()}'
 
 
-def is_soong_prebuilt_module(file_metadata):
-  return (file_metadata['soong_module_type'] and
-          file_metadata['soong_module_type'] in SOONG_PREBUILT_MODULE_TYPES)
+checksum_executor = None
+
+
+def init_checksum_executor():
+  """Start the threads used by checksum_batch() in the current process, which live as long as the process."""
+  global checksum_executor
+  checksum_executor = concurrent.futures.ThreadPoolExecutor(max_workers=CHECKSUM_THREADS_PER_PROCESS)
+
+
+def checksum_batch(files):
+  """Return checksums of a batch of (file_path, file_stat) tuples.
+
+  Both file reads and SHA-1 release the GIL, so threads let reading a file overlap with hashing others.
+  """
+  if not checksum_executor:
+    init_checksum_executor()
+  return list(checksum_executor.map(lambda file: checksum(*file), files))
+
+
+def calculate_checksums(file_stats, cache_file_path=None):
+  """Return checksums of files keyed by file path.
 
+  file_stats maps the path of each file to its os.lstat() result.
 
-def is_source_package(file_metadata):
-  module_path = file_metadata['module_path']
-  return module_path.startswith('external/') and not is_prebuilt_package(file_metadata)
+  If cache_file_path is set, checksums of files whose mtime and size are unchanged since the last run
+  are reused from the cache file, and the cache file is rewritten with the files of this run. Other
+  checksums are calculated in parallel.
+  """
+  cache = {}
+  if cache_file_path:
+    try:
+      with open(cache_file_path, encoding='utf-8') as cache_file:
+        cache = json.load(cache_file)
+    except (OSError, ValueError):
+      pass
+
+  checksums = {}
+  new_cache = {}
+  stale_file_paths = []
+  for file_path, st in file_stats.items():
+    entry = cache.get(file_path)
+    if entry and entry[:2] == [st.st_mtime_ns, st.st_size]:
+      checksums[file_path] = entry[2]
+      new_cache[file_path] = entry
+    else:
+      new_cache[file_path] = [st.st_mtime_ns, st.st_size]
+      stale_file_paths.append(file_path)
+
+  # Checksums are independent of each other, so calculate them in parallel
+  stale_files = [(file_path, file_stats[file_path]) for file_path in stale_file_paths]
+  batches = [stale_files[i:i + CHECKSUM_BATCH_SIZE] for i in range(0, len(stale_files), CHECKSUM_BATCH_SIZE)]
+  if len(batches) > 1:
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(os.cpu_count(), len(batches)),
+                                                initializer=init_checksum_executor) as executor:
+      all_batch_checksums = list(executor.map(checksum_batch, batches))
+  else:
+    # Not worth starting worker processes for a single batch, e.g. for the few files of an unbundled APEX
+    all_batch_checksums = [checksum_batch(batch) for batch in batches]
+  for batch, batch_checksums in zip(batches, all_batch_checksums):
+    for (file_path, _), sha1 in zip(batch, batch_checksums):
+      checksums[file_path] = sha1
+      new_cache[file_path].append(sha1)
+
+  if cache_file_path:
+    # Write to a temporary file first so concurrent runs never see a partially written cache
+    tmp_cache_file_path = f'{cache_file_path}.{os.getpid()}.tmp'
+    with open(tmp_cache_file_path, 'w', encoding='utf-8') as cache_file:
+      json.dump(new_cache, cache_file)
+    os.replace(tmp_cache_file_path, cache_file_path)
+
+  return checksums
+
+
+def is_soong_prebuilt_module(file_metadata):
+  return (file_metadata.soong_module_type and
+          file_metadata.soong_module_type in SOONG_PREBUILT_MODULE_TYPES)
 
 
 def is_prebuilt_package(file_metadata):
-  module_path = file_metadata['module_path']
+  module_path = file_metadata.module_path
   if module_path:
     return (module_path.startswith('prebuilts/') or
             is_soong_prebuilt_module(file_metadata) or
-            file_metadata['is_prebuilt_make_module'])
+            file_metadata.is_prebuilt_make_module)
 
-  kernel_module_copy_files = file_metadata['kernel_module_copy_files']
+  kernel_module_copy_files = file_metadata.kernel_module_copy_files
   if kernel_module_copy_files and not kernel_module_copy_files.startswith('ANDROID-GEN:'):
     return True
 
   return False
 
 
+def get_package_type(file_metadata):
+  """Return the type of package an installed file is from, PKG_SOURCE or PKG_PREBUILT for source/prebuilt fork
+  packages and PKG_PLATFORM for the PLATFORM package. Return None if it could not be decided.
+  """
+  if is_prebuilt_package(file_metadata):
+    return PKG_PREBUILT
+  if file_metadata.module_path.startswith('external/'):
+    return PKG_SOURCE
+
+  if file_metadata.module_path or file_metadata.is_platform_generated:
+    return PKG_PLATFORM
+  if file_metadata.product_copy_files:
+    # Format of product_copy_files: <source path>:<dest path>
+    # So far product_copy_files are copied from directory system, kernel, hardware, frameworks and device,
+    # so process them as files from PLATFORM package
+    return PKG_PLATFORM
+  if file_metadata.installed_file.endswith('.fsv_meta'):
+    # See build/make/core/Makefile:2988
+    return PKG_PLATFORM
+  if file_metadata.kernel_module_copy_files.startswith('ANDROID-GEN'):
+    # For the four files generated for _dlkm, _ramdisk partitions
+    # See build/make/core/Makefile:323
+    return PKG_PLATFORM
+
+  return None
+
+
 def get_source_package_info(file_metadata, metadata_file_path):
   """Return source package info exists in its METADATA file, currently including name, security tag
   and external SBOM reference.
@@ -166,17 +310,18 @@ def get_source_package_info(file_metadata, metadata_file_path):
   See go/android-spdx and go/android-sbom-gen for more details.
   """
   if not metadata_file_path:
-    return file_metadata['module_path'], []
+    return file_metadata.module_path, []
 
   metadata_proto = metadata_file_protos[metadata_file_path]
   external_refs = []
   for tag in metadata_proto.third_party.security.tag:
-    if tag.lower().startswith((NVD_CPE23 + 'cpe:2.3:').lower()):
+    lower_tag = tag.lower()
+    if lower_tag.startswith(NVD_CPE23_CPE23_PREFIX):
       external_refs.append(
         sbom_data.PackageExternalRef(category=sbom_data.PackageExternalRefCategory.SECURITY,
                                      type=sbom_data.PackageExternalRefType.cpe23Type,
                                      locator=tag.removeprefix(NVD_CPE23)))
-    elif tag.lower().startswith((NVD_CPE23 + 'cpe:/').lower()):
+    elif lower_tag.startswith(NVD_CPE23_CPE22_PREFIX):
       external_refs.append(
         sbom_data.PackageExternalRef(category=sbom_data.PackageExternalRefCategory.SECURITY,
                                      type=sbom_data.PackageExternalRefType.cpe22Type,
@@ -201,27 +346,36 @@ def get_prebuilt_package_name(file_metadata, metadata_file_path):
       name = metadata_proto.name
     else:
       name = metadata_file_path
-  elif file_metadata['module_path']:
-    name = file_metadata['module_path']
-  elif file_metadata['kernel_module_copy_files']:
-    src_path = file_metadata['kernel_module_copy_files'].split(':')[0]
-    name = os.path.dirname(src_path)
+  elif file_metadata.module_path:
+    name = file_metadata.module_path
+  elif file_metadata.kernel_module_copy_files:
+    name = file_metadata.kernel_module_src_dir
 
   return name.removeprefix('prebuilts/').replace('/', '-')
 
 
+@functools.lru_cache(maxsize=None)
+def find_metadata_file_path(path):
+  """Return the closest directory to path, including itself, that has a METADATA file.
+
+  Recursing through the cache memoizes the answer for every ancestor probed, so each directory is checked
+  for a METADATA file at most once no matter how many module paths share it.
+  """
+  if not path or os.path.exists(path + '/METADATA'):
+    return path
+
+  return find_metadata_file_path(os.path.dirname(path))
+
+
 def get_metadata_file_path(file_metadata):
   """Search for METADATA file of a package and return its path."""
   metadata_path = ''
-  if file_metadata['module_path']:
-    metadata_path = file_metadata['module_path']
-  elif file_metadata['kernel_module_copy_files']:
-    metadata_path = os.path.dirname(file_metadata['kernel_module_copy_files'].split(':')[0])
+  if file_metadata.module_path:
+    metadata_path = file_metadata.module_path
+  elif file_metadata.kernel_module_copy_files:
+    metadata_path = file_metadata.kernel_module_src_dir
 
-  while metadata_path and not os.path.exists(metadata_path + '/METADATA'):
-    metadata_path = os.path.dirname(metadata_path)
-
-  return metadata_path
+  return find_metadata_file_path(metadata_path)
 
 
 def get_package_version(metadata_file_path):
@@ -261,7 +415,7 @@ def get_package_download_location(metadata_file_path):
   return None
 
 
-def get_sbom_fragments(installed_file_metadata, metadata_file_path):
+def get_sbom_fragments(installed_file_metadata, package_type, metadata_file_path):
   """Return SPDX fragment of source/prebuilt packages, which usually contains a SOURCE/PREBUILT
   package, a UPSTREAM package and an external SBOM document reference if sbom_ref defined in its
   METADATA file.
@@ -277,13 +431,13 @@ def get_sbom_fragments(installed_file_metadata, metadata_file_path):
   version = get_package_version(metadata_file_path)
   download_location = get_package_download_location(metadata_file_path)
 
-  if is_source_package(installed_file_metadata):
+  if package_type == PKG_SOURCE:
     # Source fork packages
     name, external_refs = get_source_package_info(installed_file_metadata, metadata_file_path)
     source_package_id = new_package_id(name, PKG_SOURCE)
     source_package = sbom_data.Package(id=source_package_id, name=name, version=args.build_version,
                                        download_location=sbom_data.VALUE_NONE,
-                                       supplier='Organization: ' + args.product_mfr,
+                                       supplier=product_supplier,
                                        external_refs=external_refs)
 
     upstream_package_id = new_package_id(name, PKG_UPSTREAM)
@@ -294,7 +448,7 @@ def get_sbom_fragments(installed_file_metadata, metadata_file_path):
     relationships.append(sbom_data.Relationship(id1=source_package_id,
                                                 relationship=sbom_data.RelationshipType.VARIANT_OF,
                                                 id2=upstream_package_id))
-  elif is_prebuilt_package(installed_file_metadata):
+  elif package_type == PKG_PREBUILT:
     # Prebuilt fork packages
     name = get_prebuilt_package_name(installed_file_metadata, metadata_file_path)
     prebuilt_package_id = new_package_id(name, PKG_PREBUILT)
@@ -302,7 +456,7 @@ def get_sbom_fragments(installed_file_metadata, metadata_file_path):
                                          name=name,
                                          download_location=sbom_data.VALUE_NONE,
                                          version=version if version else args.build_version,
-                                         supplier='Organization: ' + args.product_mfr)
+                                         supplier=product_supplier)
 
     upstream_package_id = new_package_id(name, PKG_UPSTREAM)
     upstream_package = sbom_data.Package(id=upstream_package_id, name=name, version = version,
@@ -332,6 +486,18 @@ def get_sbom_fragments(installed_file_metadata, metadata_file_path):
   return external_doc_ref, packages, relationships
 
 
+def write_sbom_files(doc, writers):
+  """Write doc to SBOM files concurrently. writers maps each file path to the function writing its format."""
+  def write_sbom_file(file_path, write):
+    with open(file_path, 'w', encoding='utf-8') as file:
+      write(doc, file)
+
+  with concurrent.futures.ThreadPoolExecutor(max_workers=len(writers)) as executor:
+    futures = [executor.submit(write_sbom_file, file_path, write) for file_path, write in writers.items()]
+    for future in futures:
+      future.result()
+
+
 def save_report(report_file_path, report):
   with open(report_file_path, 'w', encoding='utf-8') as report_file:
     for type, issues in report.items():
@@ -343,11 +509,11 @@ def save_report(report_file_path, report):
 
 # Validate the metadata generated by Make for installed files and report if there is no metadata.
 def installed_file_has_metadata(installed_file_metadata, report):
-  installed_file = installed_file_metadata['installed_file']
-  module_path = installed_file_metadata['module_path']
-  product_copy_files = installed_file_metadata['product_copy_files']
-  kernel_module_copy_files = installed_file_metadata['kernel_module_copy_files']
-  is_platform_generated = installed_file_metadata['is_platform_generated']
+  installed_file = installed_file_metadata.installed_file
+  module_path = installed_file_metadata.module_path
+  product_copy_files = installed_file_metadata.product_copy_files
+  kernel_module_copy_files = installed_file_metadata.kernel_module_copy_files
+  is_platform_generated = installed_file_metadata.is_platform_generated
 
   if (not module_path and
       not product_copy_files and
@@ -360,73 +526,135 @@ def installed_file_has_metadata(installed_file_metadata, report):
   return True
 
 
-def report_metadata_file(metadata_file_path, installed_file_metadata, report):
-  if metadata_file_path:
-    report[INFO_METADATA_FOUND_FOR_PACKAGE].append(
-        'installed_file: {}, module_path: {}, METADATA file: {}'.format(
-            installed_file_metadata['installed_file'],
-            installed_file_metadata['module_path'],
-            metadata_file_path + '/METADATA'))
+def load_metadata_file(metadata_file_path, cache_dir=None):
+  """Parse the METADATA file in directory metadata_file_path.
 
-    package_metadata = metadata_file_pb2.Metadata()
-    with open(metadata_file_path + '/METADATA', 'rt') as f:
+  Parsing text format is slow, so if cache_dir is set the parsed proto is also saved in binary wire format
+  under cache_dir, at the path of the METADATA file relative to the source tree. It is reused while it is
+  not older than the METADATA file.
+  """
+  metadata_file = metadata_file_path + '/METADATA'
+  package_metadata = metadata_file_pb2.Metadata()
+  if not cache_dir:
+    with open(metadata_file, 'rt') as f:
       text_format.Parse(f.read(), package_metadata)
+    return package_metadata
 
-    if not metadata_file_path in metadata_file_protos:
-      metadata_file_protos[metadata_file_path] = package_metadata
-      if not package_metadata.name:
-        report[ISSUE_METADATA_FILE_INCOMPLETE].append(f'{metadata_file_path}/METADATA does not has "name"')
+  cache_file = os.path.join(cache_dir, metadata_file_path, 'METADATA.pb')
+  try:
+    if os.stat(cache_file).st_mtime_ns >= os.stat(metadata_file).st_mtime_ns:
+      with open(cache_file, 'rb') as f:
+        package_metadata.ParseFromString(f.read())
+      return package_metadata
+  except (OSError, message.DecodeError):
+    package_metadata.Clear()
+
+  with open(metadata_file, 'rt') as f:
+    text_format.Parse(f.read(), package_metadata)
+
+  os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+  tmp_cache_file = f'{cache_file}.{os.getpid()}.tmp'
+  with open(tmp_cache_file, 'wb') as f:
+    f.write(package_metadata.SerializeToString())
+  os.replace(tmp_cache_file, cache_file)
+
+  return package_metadata
+
+
+def report_metadata_file_issues(metadata_file_path, package_metadata, report):
+  if not package_metadata.name:
+    report[ISSUE_METADATA_FILE_INCOMPLETE].append(f'{metadata_file_path}/METADATA does not has "name"')
+
+  if not package_metadata.third_party.version:
+    report[ISSUE_METADATA_FILE_INCOMPLETE].append(
+        f'{metadata_file_path}/METADATA does not has "third_party.version"')
+
+  for tag in package_metadata.third_party.security.tag:
+    if not tag.startswith(NVD_CPE23):
+      report[ISSUE_UNKNOWN_SECURITY_TAG_TYPE].append(
+          f'Unknown security tag type: {tag} in {metadata_file_path}/METADATA')
 
-      if not package_metadata.third_party.version:
-        report[ISSUE_METADATA_FILE_INCOMPLETE].append(
-            f'{metadata_file_path}/METADATA does not has "third_party.version"')
 
-      for tag in package_metadata.third_party.security.tag:
-        if not tag.startswith(NVD_CPE23):
-          report[ISSUE_UNKNOWN_SECURITY_TAG_TYPE].append(
-              f'Unknown security tag type: {tag} in {metadata_file_path}/METADATA')
+def report_metadata_file(metadata_file_path, installed_file_metadata, report):
+  if metadata_file_path:
+    report[INFO_METADATA_FOUND_FOR_PACKAGE].append(
+        'installed_file: {}, module_path: {}, METADATA file: {}'.format(
+            installed_file_metadata.installed_file,
+            installed_file_metadata.module_path,
+            metadata_file_path + '/METADATA'))
   else:
     report[ISSUE_NO_METADATA_FILE].append(
         "installed_file: {}, module_path: {}".format(
-            installed_file_metadata['installed_file'], installed_file_metadata['module_path']))
+            installed_file_metadata.installed_file, installed_file_metadata.module_path))
+
+
+@dataclasses.dataclass(slots=True)
+class InstalledFileMetadata:
+  """A row of the SBOM metadata CSV file, see core/main.mk for details of the columns."""
+  installed_file: str
+  module_path: str
+  soong_module_type: str
+  is_prebuilt_make_module: str
+  product_copy_files: str
+  kernel_module_copy_files: str
+  is_platform_generated: str
+  build_output_path: str
+  static_libraries: str
+  whole_static_libraries: str
+  is_static_lib: str
+  # Directory of the source path in kernel_module_copy_files, whose format is <source path>:<dest path>
+  kernel_module_src_dir: str = dataclasses.field(init=False)
+
+  def __post_init__(self):
+    self.kernel_module_src_dir = os.path.dirname(self.kernel_module_copy_files.split(':')[0])
+
+
+def read_metadata_csv(csv_file_path):
+  """Yield rows of the SBOM metadata CSV file as InstalledFileMetadata."""
+  with open(csv_file_path, newline='') as sbom_metadata_file:
+    reader = csv.reader(sbom_metadata_file)
+    header = next(reader)
+    get_columns = operator.itemgetter(*(header.index(f.name) for f in dataclasses.fields(InstalledFileMetadata)
+                                        if f.init))
+    for row in reader:
+      yield InstalledFileMetadata(*get_columns(row))
 
 
 def generate_sbom_for_unbundled_apk():
-  with open(args.metadata, newline='') as sbom_metadata_file:
-    reader = csv.DictReader(sbom_metadata_file)
-    doc = sbom_data.Document(name=args.build_version,
-                             namespace=f'https://www.google.com/sbom/spdx/android/{args.build_version}',
-                             creators=['Organization: ' + args.product_mfr])
-    for installed_file_metadata in reader:
-      installed_file = installed_file_metadata['installed_file']
-      if args.output_file != installed_file_metadata['build_output_path'] + '.spdx.json':
-        continue
-
-      module_path = installed_file_metadata['module_path']
-      package_id = new_package_id(module_path, PKG_PREBUILT)
-      package = sbom_data.Package(id=package_id,
-                                  name=module_path,
-                                  version=args.build_version,
-                                  supplier='Organization: ' + args.product_mfr)
-      file_id = new_file_id(installed_file)
-      file = sbom_data.File(id=file_id,
-                            name=installed_file,
-                            checksum=checksum(installed_file_metadata['build_output_path']))
-      relationship = sbom_data.Relationship(id1=file_id,
-                                            relationship=sbom_data.RelationshipType.GENERATED_FROM,
-                                            id2=package_id)
-      doc.add_package(package)
-      doc.files.append(file)
-      doc.describes = file_id
-      doc.add_relationship(relationship)
-      doc.created = datetime.datetime.now(tz=datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
-      break
-
-  with open(args.output_file, 'w', encoding='utf-8') as file:
-    sbom_writers.JSONWriter.write(doc, file)
+  doc = sbom_data.Document(name=args.build_version,
+                           namespace=f'https://www.google.com/sbom/spdx/android/{args.build_version}',
+                           creators=[product_supplier])
+  for installed_file_metadata in read_metadata_csv(args.metadata):
+    installed_file = installed_file_metadata.installed_file
+    if args.output_file != installed_file_metadata.build_output_path + '.spdx.json':
+      continue
+
+    module_path = installed_file_metadata.module_path
+    package_id = new_package_id(module_path, PKG_PREBUILT)
+    package = sbom_data.Package(id=package_id,
+                                name=module_path,
+                                version=args.build_version,
+                                supplier=product_supplier)
+    file_id = new_file_id(installed_file)
+    file = sbom_data.File(id=file_id,
+                          name=installed_file,
+                          checksum=checksum(installed_file_metadata.build_output_path,
+                                            os.lstat(installed_file_metadata.build_output_path)))
+    relationship = sbom_data.Relationship(id1=file_id,
+                                          relationship=sbom_data.RelationshipType.GENERATED_FROM,
+                                          id2=package_id)
+    doc.add_package(package)
+    doc.files.append(file)
+    doc.describes = file_id
+    doc.add_relationship(relationship)
+    doc.created = datetime.datetime.now(tz=datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    break
+
   fragment_file = args.output_file.removesuffix('.spdx.json') + '-fragment.spdx'
-  with open(fragment_file, 'w', encoding='utf-8') as file:
-    sbom_writers.TagValueWriter.write(doc, file, fragment=True)
+  write_sbom_files(doc, {
+    args.output_file: sbom_writers.JSONWriter.write,
+    fragment_file: functools.partial(sbom_writers.TagValueWriter.write, fragment=True),
+  })
 
 
 def main():
@@ -434,6 +662,9 @@ def main():
   args = get_args()
   log('Args:', vars(args))
 
+  global product_supplier
+  product_supplier = 'Organization: ' + args.product_mfr
+
   if args.unbundled_apk:
     generate_sbom_for_unbundled_apk()
     return
@@ -445,12 +676,12 @@ def main():
                                       name=sbom_data.PACKAGE_NAME_PRODUCT,
                                       download_location=sbom_data.VALUE_NONE,
                                       version=args.build_version,
-                                      supplier='Organization: ' + args.product_mfr,
+                                      supplier=product_supplier,
                                       files_analyzed=True)
 
   doc = sbom_data.Document(name=args.build_version,
                            namespace=f'https://www.google.com/sbom/spdx/android/{args.build_version}',
-                           creators=['Organization: ' + args.product_mfr])
+                           creators=[product_supplier])
   if not args.unbundled_apex:
     doc.packages.append(product_package)
 
@@ -458,7 +689,7 @@ def main():
                                         name=sbom_data.PACKAGE_NAME_PLATFORM,
                                         download_location=sbom_data.VALUE_NONE,
                                         version=args.build_version,
-                                        supplier='Organization: ' + args.product_mfr))
+                                        supplier=product_supplier))
 
   # Report on some issues and information
   report = {
@@ -470,93 +701,114 @@ def main():
     INFO_METADATA_FOUND_FOR_PACKAGE: [],
   }
 
-  # Scan the metadata in CSV file and create the corresponding package and file records in SPDX
-  with open(args.metadata, newline='') as sbom_metadata_file:
-    reader = csv.DictReader(sbom_metadata_file)
-    for installed_file_metadata in reader:
-      installed_file = installed_file_metadata['installed_file']
-      module_path = installed_file_metadata['module_path']
-      product_copy_files = installed_file_metadata['product_copy_files']
-      kernel_module_copy_files = installed_file_metadata['kernel_module_copy_files']
-      build_output_path = installed_file_metadata['build_output_path']
-      is_static_lib = installed_file_metadata['is_static_lib']
-
-      if not installed_file_has_metadata(installed_file_metadata, report):
-        continue
-      if not is_static_lib and not (os.path.islink(build_output_path) or os.path.isfile(build_output_path)):
-        # Ignore non-existing static library files for now since they are not shipped on devices.
-        report[ISSUE_INSTALLED_FILE_NOT_EXIST].append(installed_file)
-        continue
-
-      file_id = new_file_id(installed_file)
-      # TODO(b/285453664): Soong should report the information of statically linked libraries to Make.
-      # This happens when a different sanitized version of static libraries is used in linking.
-      # As a workaround, use the following SHA1 checksum for static libraries created by Soong, if .a files could not be
-      # located correctly because Soong doesn't report the information to Make.
-      sha1 = 'SHA1: da39a3ee5e6b4b0d3255bfef95601890afd80709'  # SHA1 of empty string
-      if os.path.islink(build_output_path) or os.path.isfile(build_output_path):
-        sha1 = checksum(build_output_path)
-      doc.files.append(sbom_data.File(id=file_id,
-                                      name=installed_file,
-                                      checksum=sha1))
-
-      if not is_static_lib:
-        if not args.unbundled_apex:
-          product_package.file_ids.append(file_id)
-        elif len(doc.files) > 1:
-            doc.add_relationship(sbom_data.Relationship(doc.files[0].id, sbom_data.RelationshipType.CONTAINS, file_id))
-
-      if is_source_package(installed_file_metadata) or is_prebuilt_package(installed_file_metadata):
-        metadata_file_path = get_metadata_file_path(installed_file_metadata)
-        report_metadata_file(metadata_file_path, installed_file_metadata, report)
-
-        # File from source fork packages or prebuilt fork packages
-        external_doc_ref, pkgs, rels = get_sbom_fragments(installed_file_metadata, metadata_file_path)
-        if len(pkgs) > 0:
-          if external_doc_ref:
-            doc.add_external_ref(external_doc_ref)
-          for p in pkgs:
-            doc.add_package(p)
-          for rel in rels:
-            doc.add_relationship(rel)
-          fork_package_id = pkgs[0].id  # The first package should be the source/prebuilt fork package
-          doc.add_relationship(sbom_data.Relationship(id1=file_id,
-                                                      relationship=sbom_data.RelationshipType.GENERATED_FROM,
-                                                      id2=fork_package_id))
-      elif module_path or installed_file_metadata['is_platform_generated']:
-        # File from PLATFORM package
-        doc.add_relationship(sbom_data.Relationship(id1=file_id,
-                                                    relationship=sbom_data.RelationshipType.GENERATED_FROM,
-                                                    id2=sbom_data.SPDXID_PLATFORM))
-      elif product_copy_files:
-        # Format of product_copy_files: <source path>:<dest path>
-        src_path = product_copy_files.split(':')[0]
-        # So far product_copy_files are copied from directory system, kernel, hardware, frameworks and device,
-        # so process them as files from PLATFORM package
-        doc.add_relationship(sbom_data.Relationship(id1=file_id,
-                                                    relationship=sbom_data.RelationshipType.GENERATED_FROM,
-                                                    id2=sbom_data.SPDXID_PLATFORM))
-      elif installed_file.endswith('.fsv_meta'):
-        # See build/make/core/Makefile:2988
-        doc.add_relationship(sbom_data.Relationship(id1=file_id,
-                                                    relationship=sbom_data.RelationshipType.GENERATED_FROM,
-                                                    id2=sbom_data.SPDXID_PLATFORM))
-      elif kernel_module_copy_files.startswith('ANDROID-GEN'):
-        # For the four files generated for _dlkm, _ramdisk partitions
-        # See build/make/core/Makefile:323
-        doc.add_relationship(sbom_data.Relationship(id1=file_id,
+  # Caches are only kept between runs for the product SBOM, which is given the product out directory
+  cache_dir = None if args.unbundled_apex else args.product_out_dir
+
+  # Scan the metadata in CSV file and skip installed files without metadata or not existing
+  installed_files_metadata = []
+  build_output_stats = {}
+  metadata_file_paths = {}
+  for installed_file_metadata in read_metadata_csv(args.metadata):
+    build_output_path = installed_file_metadata.build_output_path
+
+    if not installed_file_has_metadata(installed_file_metadata, report):
+      continue
+    try:
+      build_output_stat = os.lstat(build_output_path)
+    except OSError:
+      build_output_stat = None
+    build_output_exists = build_output_stat and (stat.S_ISLNK(build_output_stat.st_mode) or
+                                                 stat.S_ISREG(build_output_stat.st_mode))
+    if not installed_file_metadata.is_static_lib and not build_output_exists:
+      # Ignore non-existing static library files for now since they are not shipped on devices.
+      report[ISSUE_INSTALLED_FILE_NOT_EXIST].append(installed_file_metadata.installed_file)
+      continue
+
+    package_type = get_package_type(installed_file_metadata)
+    installed_files_metadata.append((installed_file_metadata, package_type))
+    if build_output_exists:
+      build_output_stats[build_output_path] = build_output_stat
+    if package_type in (PKG_SOURCE, PKG_PREBUILT):
+      metadata_file_path = get_metadata_file_path(installed_file_metadata)
+      if metadata_file_path:
+        metadata_file_paths[metadata_file_path] = None
+
+  # Load all METADATA files of source/prebuilt fork packages before generating SPDX records, reading
+  # them in parallel to overlap file I/O
+  load = functools.partial(load_metadata_file,
+                           cache_dir=os.path.join(cache_dir, METADATA_CACHE_DIR) if cache_dir else None)
+  with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+    for metadata_file_path, package_metadata in zip(metadata_file_paths, executor.map(load, metadata_file_paths)):
+      metadata_file_protos[metadata_file_path] = package_metadata
+      report_metadata_file_issues(metadata_file_path, package_metadata, report)
+
+  checksums = calculate_checksums(build_output_stats,
+                                  os.path.join(cache_dir, CHECKSUM_CACHE_FILE) if cache_dir else None)
+
+  # Create the corresponding package and file records in SPDX. Records are collected in lists and added to
+  # the document at the end, since adding them one by one checks duplicates against all records every time.
+  files = []
+  packages = []
+  relationships = []
+  external_refs = []
+  for installed_file_metadata, package_type in installed_files_metadata:
+    installed_file = installed_file_metadata.installed_file
+    build_output_path = installed_file_metadata.build_output_path
+    is_static_lib = installed_file_metadata.is_static_lib
+
+    file_id = new_file_id(installed_file)
+    # TODO(b/285453664): Soong should report the information of statically linked libraries to Make.
+    # This happens when a different sanitized version of static libraries is used in linking.
+    # As a workaround, use the following SHA1 checksum for static libraries created by Soong, if .a files could not be
+    # located correctly because Soong doesn't report the information to Make.
+    sha1 = 'SHA1: da39a3ee5e6b4b0d3255bfef95601890afd80709'  # SHA1 of empty string
+    if build_output_path in checksums:
+      sha1 = checksums[build_output_path]
+    files.append(sbom_data.File(id=file_id,
+                                name=installed_file,
+                                checksum=sha1))
+
+    if not is_static_lib:
+      if not args.unbundled_apex:
+        product_package.file_ids.append(file_id)
+      elif len(files) > 1:
+          relationships.append(sbom_data.Relationship(files[0].id, sbom_data.RelationshipType.CONTAINS, file_id))
+
+    if package_type in (PKG_SOURCE, PKG_PREBUILT):
+      metadata_file_path = get_metadata_file_path(installed_file_metadata)
+      report_metadata_file(metadata_file_path, installed_file_metadata, report)
+
+      # File from source fork packages or prebuilt fork packages
+      external_doc_ref, pkgs, rels = get_sbom_fragments(installed_file_metadata, package_type, metadata_file_path)
+      if len(pkgs) > 0:
+        if external_doc_ref:
+          external_refs.append(external_doc_ref)
+        packages += pkgs
+        relationships += rels
+        fork_package_id = pkgs[0].id  # The first package should be the source/prebuilt fork package
+        relationships.append(sbom_data.Relationship(id1=file_id,
                                                     relationship=sbom_data.RelationshipType.GENERATED_FROM,
-                                                    id2=sbom_data.SPDXID_PLATFORM))
-
-      # Process static libraries and whole static libraries the installed file links to
-      static_libs = installed_file_metadata['static_libraries']
-      whole_static_libs = installed_file_metadata['whole_static_libraries']
-      all_static_libs = (static_libs + ' ' + whole_static_libs).strip()
-      if all_static_libs:
-        for lib in all_static_libs.split(' '):
-          doc.add_relationship(sbom_data.Relationship(id1=file_id,
-                                                      relationship=sbom_data.RelationshipType.STATIC_LINK,
-                                                      id2=new_file_id(lib + '.a')))
+                                                    id2=fork_package_id))
+    elif package_type == PKG_PLATFORM:
+      # File from PLATFORM package
+      relationships.append(sbom_data.Relationship(id1=file_id,
+                                                  relationship=sbom_data.RelationshipType.GENERATED_FROM,
+                                                  id2=sbom_data.SPDXID_PLATFORM))
+
+    # Process static libraries and whole static libraries the installed file links to
+    static_libs = installed_file_metadata.static_libraries
+    whole_static_libs = installed_file_metadata.whole_static_libraries
+    all_static_libs = (static_libs + ' ' + whole_static_libs).strip()
+    if all_static_libs:
+      for lib in all_static_libs.split(' '):
+        relationships.append(sbom_data.Relationship(id1=file_id,
+                                                    relationship=sbom_data.RelationshipType.STATIC_LINK,
+                                                    id2=new_file_id(lib + '.a')))
+
+  doc.files.extend(files)
+  doc.add_external_refs(external_refs)
+  doc.add_packages(packages)
+  doc.add_relationships(relationships)
 
   if args.unbundled_apex:
     doc.describes = doc.files[0].id
@@ -573,11 +825,10 @@ def main():
   output_file = prefix + '.spdx'
   if args.unbundled_apex:
     output_file = prefix + '-fragment.spdx'
-  with open(output_file, 'w', encoding="utf-8") as file:
-    sbom_writers.TagValueWriter.write(doc, file, fragment=args.unbundled_apex)
+  writers = {output_file: functools.partial(sbom_writers.TagValueWriter.write, fragment=args.unbundled_apex)}
   if args.json:
-    with open(prefix + '.spdx.json', 'w', encoding="utf-8") as file:
-      sbom_writers.JSONWriter.write(doc, file)
+    writers[prefix + '.spdx.json'] = sbom_writers.JSONWriter.write
+  write_sbom_files(doc, writers)
 
   save_report(prefix + '-gen-report.txt', report)
 
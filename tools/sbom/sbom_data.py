@@ -125,16 +125,40 @@ class Document:
                for r in self.relationships):
       self.relationships.append(rel)
 
+  def add_external_refs(self, external_refs):
+    """Same as add_external_ref() for each external reference, but in one pass."""
+    uris = {ref.uri for ref in self.external_refs}
+    for external_ref in external_refs:
+      if external_ref.uri not in uris:
+        uris.add(external_ref.uri)
+        self.external_refs.append(external_ref)
+
+  def add_packages(self, packages):
+    """Same as add_package() for each package, but in one pass."""
+    ids = {p.id for p in self.packages}
+    for package in packages:
+      if package.id not in ids:
+        ids.add(package.id)
+        self.packages.append(package)
+
+  def add_relationships(self, rels):
+    """Same as add_relationship() for each relationship, but in one pass."""
+    keys = {(r.id1, r.id2, r.relationship) for r in self.relationships}
+    for rel in rels:
+      key = (rel.id1, rel.id2, rel.relationship)
+      if key not in keys:
+        keys.add(key)
+        self.relationships.append(rel)
+
   def generate_packages_verification_code(self):
     for package in self.packages:
       if not package.file_ids:
         continue
 
-      checksums = []
-      for file in self.files:
-        if file.id in package.file_ids:
-          checksums.append(file.checksum)
-      checksums.sort()
-      h = hashlib.sha1()
-      h.update(''.join(checksums).encode(encoding='utf-8'))
+      file_ids = set(package.file_ids)
+      checksums = sorted(file.checksum for file in self.files if file.id in file_ids)
+      # Hashing the checksums one by one is the same as hashing their concatenation
+      h = hashlib.sha1(usedforsecurity=False)
+      for checksum in checksums:
+        h.update(checksum.encode(encoding='utf-8'))
       package.verification_code = h.hexdigest()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import unittest
+import sbom_data
+
+SPDXID_FILE1 = 'SPDXRef-file1'
+SPDXID_FILE2 = 'SPDXRef-file2'
+SPDXID_FILE3 = 'SPDXRef-file3'
+
+
+class SBOMDataTest(unittest.TestCase):
+
+  def setUp(self):
+    self.sbom_doc = sbom_data.Document(name='test doc',
+                                       namespace='http://www.google.com/sbom/spdx/android')
+    self.sbom_doc.files = [
+      sbom_data.File(id=SPDXID_FILE1, name='/bin/file1', checksum='SHA1: 22222'),
+      sbom_data.File(id=SPDXID_FILE2, name='/bin/file2', checksum='SHA1: 11111'),
+      sbom_data.File(id=SPDXID_FILE3, name='/bin/file3', checksum='SHA1: 33333'),
+    ]
+
+  def test_generate_packages_verification_code(self):
+    package = sbom_data.Package(id=sbom_data.SPDXID_PRODUCT,
+                                name=sbom_data.PACKAGE_NAME_PRODUCT,
+                                file_ids=[SPDXID_FILE1, SPDXID_FILE2])
+    package_without_files = sbom_data.Package(id=sbom_data.SPDXID_PLATFORM,
+                                              name=sbom_data.PACKAGE_NAME_PLATFORM)
+    self.sbom_doc.packages = [package, package_without_files]
+
+    self.sbom_doc.generate_packages_verification_code()
+
+    self.assertEqual(package.verification_code, hashlib.sha1(b'SHA1: 11111SHA1: 22222').hexdigest())
+    self.assertIsNone(package_without_files.verification_code)
+
+  def test_add_in_bulk_skips_duplicates(self):
+    self.sbom_doc.add_package(sbom_data.Package(id=sbom_data.SPDXID_PLATFORM,
+                                                name=sbom_data.PACKAGE_NAME_PLATFORM))
+    self.sbom_doc.add_packages([
+      sbom_data.Package(id=sbom_data.SPDXID_PLATFORM, name='duplicate'),
+      sbom_data.Package(id=sbom_data.SPDXID_PRODUCT, name=sbom_data.PACKAGE_NAME_PRODUCT),
+      sbom_data.Package(id=sbom_data.SPDXID_PRODUCT, name='duplicate'),
+    ])
+    self.assertEqual([p.name for p in self.sbom_doc.packages],
+                     [sbom_data.PACKAGE_NAME_PLATFORM, sbom_data.PACKAGE_NAME_PRODUCT])
+
+    rel1 = sbom_data.Relationship(SPDXID_FILE1, sbom_data.RelationshipType.GENERATED_FROM, sbom_data.SPDXID_PLATFORM)
+    rel2 = sbom_data.Relationship(SPDXID_FILE1, sbom_data.RelationshipType.STATIC_LINK, sbom_data.SPDXID_PLATFORM)
+    self.sbom_doc.add_relationship(rel1)
+    self.sbom_doc.add_relationships([
+      sbom_data.Relationship(SPDXID_FILE1, sbom_data.RelationshipType.GENERATED_FROM, sbom_data.SPDXID_PLATFORM),
+      rel2,
+      sbom_data.Relationship(SPDXID_FILE1, sbom_data.RelationshipType.STATIC_LINK, sbom_data.SPDXID_PLATFORM),
+    ])
+    self.assertEqual(self.sbom_doc.relationships, [rel1, rel2])
+
+    ref1 = sbom_data.DocumentExternalReference(id='DocumentRef-1', uri='uri1', checksum='SHA1: 1')
+    ref2 = sbom_data.DocumentExternalReference(id='DocumentRef-2', uri='uri2', checksum='SHA1: 2')
+    self.sbom_doc.add_external_ref(ref1)
+    self.sbom_doc.add_external_refs([
+      sbom_data.DocumentExternalReference(id='DocumentRef-3', uri='uri1', checksum='SHA1: 3'),
+      ref2,
+    ])
+    self.assertEqual(self.sbom_doc.external_refs, [ref1, ref2])
+
+
+if __name__ == '__main__':
+  unittest.main(verbosity=2)